@@ -1,6 +1,8 @@
 from __future__ import annotations
 import os
+from functools import lru_cache
 from pathlib import Path
+import requests
 import yt_dlp
 from dotenv import load_dotenv
 from google.cloud import storage
@@ -13,6 +15,7 @@ GCS_BUCKET_NAME = os.getenv("GCS_AUDIO_BUCKET")
 DOWNLOAD_TMP_DIR = Path(os.getenv("DOWNLOAD_TMP_DIR", "data"))
 YOUTUBE_BASE_URL = "https://www.youtube.com/watch?v="
 COOKIES_FILE = Path("./keys/cookies.txt")
+GCS_HTTP_POOL_SIZE = 16
 
 
 def log(message: str) -> None:
@@ -22,10 +25,20 @@ def log(message: str) -> None:
 class DownloadError(Exception):
     pass
 
+@lru_cache(maxsize=None)
+def get_client() -> storage.Client:
+    """Create the GCS client once per process, with a larger keep-alive connection pool."""
+    client = storage.Client()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=GCS_HTTP_POOL_SIZE, pool_maxsize=GCS_HTTP_POOL_SIZE
+    )
+    client._http.mount("https://", adapter)
+    return client
+
 def init_bucket() -> storage.bucket.Bucket:
     if not GCS_BUCKET_NAME:
         raise RuntimeError("Missing GCS_AUDIO_BUCKET env var for destination bucket")
-    client = storage.Client()
+    client = get_client()
     bucket = client.bucket(GCS_BUCKET_NAME)
     log(f"Initialized GCS bucket {GCS_BUCKET_NAME}")
     return bucket
@@ -1,18 +1,28 @@
 """Audio fingerprint generation tuned for long-form speech deduplication."""
 from __future__ import annotations
-from collections import deque
-import hashlib
-from typing import List, Sequence, Tuple
+import bisect
+from functools import lru_cache
+import os
+from typing import Iterable, Iterator, List, Tuple
 import math
+import subprocess
+import tempfile
 import librosa
 import numpy as np
+from numba import njit, prange
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft as sp_fft
 from scipy.ndimage import maximum_filter
+from scipy.signal import get_window
 
 
 # Tunable parameters (override via env vars to experiment without code changes)
 SAMPLE_RATE = 16000
 HOP_LENGTH = 256                 # 62.5 fps
 N_FFT = 2048
+STFT_BLOCK_FRAMES = 2048         # frames per FFT call (bounds windowed-frame scratch memory)
+STREAM_BLOCK_SECONDS = 10        # decoded audio held in memory at once when streaming
+STFT_WORKERS = int(os.getenv("STFT_WORKERS", os.cpu_count() or 1))  # pocketfft threads per call
 
 # Peaks
 PEAK_NEIGHBORHOOD_FREQ = 12      # ~90–100 Hz span
@@ -25,11 +35,176 @@ MAX_DELTA_FRAMES = 31            # ~0.5 s
 DT_BUCKET_FRAMES = 2
 MAX_HASHES_PER_SECOND = 40
 
+# Segmentation scaling anchors (length, per_section, coverage, min_sections, max_sections)
+SEGMENT_ANCHORS = [
+    (1000,   50, 0.25, 5, 25),
+    (5000,   80, 0.20, 10, 30),
+    (15000, 120, 0.15, 15, 40),
+    (50000, 160, 0.075, 20, 50),
+    (100000,200, 0.05, 50, 50),
+]
+_SEGMENT_ANCHOR_LENGTHS = [a[0] for a in SEGMENT_ANCHORS]
+
+# Hash layout: f1 in bits 40+, f2 in bits 20-39, dt in bits 0-19
+HASH_F1_SHIFT = 40
+HASH_F2_SHIFT = 20
+
+def _ffmpeg_pcm_cmd(path: str, sr: int) -> List[str]:
+    """ffmpeg command that decodes `path` to mono float32 PCM at `sr` Hz on stdout."""
+    return [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", str(path),
+        "-f", "f32le", "-ac", "1", "-ar", str(sr),
+        "-",
+    ]
+
 def load_audio(path: str, sr: int = SAMPLE_RATE) -> Tuple[np.ndarray, int]:
-    """Load audio file as mono and return samples + sample rate."""
-    y, sr = librosa.load(path, sr=SAMPLE_RATE, mono=True, res_type='soxr_hq')
+    """Decode audio file to mono float32 at `sr` Hz through an ffmpeg PCM pipe."""
+    proc = subprocess.run(_ffmpeg_pcm_cmd(path, sr), capture_output=True)
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode(errors="replace").strip()
+        raise RuntimeError(f"ffmpeg failed to decode {path}: {stderr}")
+
+    y = np.frombuffer(proc.stdout, dtype="<f4")
     return y, sr
 
+def stream_audio(
+    path: str,
+    sr: int = SAMPLE_RATE,
+    block_seconds: float = STREAM_BLOCK_SECONDS,
+) -> Iterator[np.ndarray]:
+    """Yield mono float32 blocks of ~`block_seconds` straight from the ffmpeg pipe."""
+    block_bytes = int(block_seconds * sr) * 4
+    # stderr goes to a temp file, not a pipe: nothing reads it until stdout hits EOF, and a
+    # full stderr pipe (e.g. one error line per damaged frame) would block ffmpeg forever
+    with tempfile.TemporaryFile() as errlog:
+        proc = subprocess.Popen(_ffmpeg_pcm_cmd(path, sr), stdout=subprocess.PIPE, stderr=errlog)
+        try:
+            while True:
+                chunk = proc.stdout.read(block_bytes)
+                if not chunk:
+                    break
+                yield np.frombuffer(chunk, dtype="<f4")
+
+            if proc.wait() != 0:
+                errlog.seek(0)
+                stderr = errlog.read().decode(errors="replace").strip()
+                raise RuntimeError(f"ffmpeg failed to decode {path}: {stderr}")
+        finally:
+            # Consumer stopped early or decoding failed: don't leave ffmpeg running
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+
+@lru_cache(maxsize=None)
+def _stft_window(n_fft: int) -> np.ndarray:
+    """Periodic Hann window, built once per FFT size."""
+    return get_window("hann", n_fft, fftbins=True).astype(np.float32)
+
+def _stft(y: np.ndarray, n_fft: int = N_FFT, hop_length: int = HOP_LENGTH) -> np.ndarray:
+    """
+    Uncentered Hann STFT with the same framing as librosa.stft(center=False).
+    Frames are strided views into `y`; FFTs run block-wise so scratch memory stays bounded,
+    and each block's frames are split across STFT_WORKERS threads (pocketfft drops the GIL).
+    Returns a (1 + n_fft // 2, T) complex array.
+    """
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    window = _stft_window(n_fft)
+    frames = sliding_window_view(y, n_fft)[::hop_length]
+
+    out = np.empty((frames.shape[0], 1 + n_fft // 2), dtype=np.complex64)
+    for start in range(0, frames.shape[0], STFT_BLOCK_FRAMES):
+        stop = start + STFT_BLOCK_FRAMES
+        out[start:stop] = sp_fft.rfft(frames[start:stop] * window, axis=-1, workers=STFT_WORKERS)
+    return out.T
+
+@lru_cache(maxsize=None)
+def _band_slice(sr: int, n_fft: int, fmin: float, fmax: float) -> slice:
+    """Contiguous range of STFT rows whose bin frequency lies in [fmin, fmax] Hz."""
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    lo = int(np.searchsorted(freqs, fmin, side="left"))
+    hi = int(np.searchsorted(freqs, fmax, side="right"))
+    return slice(lo, hi)
+
+@njit(parallel=True, cache=True)
+def _band_power_db(
+    D: np.ndarray,
+    lo: int,
+    hi: int,
+    ref: float,
+    amin: float,
+    out: np.ndarray,
+) -> None:
+    """
+    Fused |D|^2 -> dB over STFT rows [lo, hi), equivalent to
+    librosa.power_to_db(np.abs(D[lo:hi]) ** 2, ref=ref, amin=amin, top_db=None).
+    Writes into `out`, a frame-major (T, hi - lo) float32 array.
+    """
+    n_frames = D.shape[1]
+    ref_db = 10.0 * np.log10(max(amin, ref))
+
+    # D is frame-major in memory, so walk frames outermost
+    for t in prange(n_frames):
+        for f in range(lo, hi):
+            v = D[f, t]
+            power = v.real * v.real + v.imag * v.imag
+            out[t, f - lo] = 10.0 * np.log10(max(amin, power)) - ref_db
+
+@njit(parallel=True, cache=True)
+def _apply_top_db(S: np.ndarray, top_db: float) -> None:
+    """In place: clamp S to `top_db` below its peak, like power_to_db's top_db."""
+    floor = S.max() - top_db
+    for i in prange(S.shape[0]):
+        for j in range(S.shape[1]):
+            if S[i, j] < floor:
+                S[i, j] = floor
+
+def stream_spectrogram(
+    blocks: Iterable[np.ndarray],
+    sr: int,
+    n_fft: int = N_FFT,
+    hop_length: int = HOP_LENGTH,
+    fmin: float = 100.0,
+    fmax: float = 3000.0,
+) -> np.ndarray:
+    """
+    Log-power spectrogram restricted to [fmin, fmax] Hz, built from consecutive audio blocks.
+    Only the in-band dB rows are kept per block; the `n_fft - hop` tail of each block is
+    carried into the next, so frames are identical to a single pass over the whole signal.
+    """
+    band = _band_slice(sr, n_fft, fmin, fmax)
+    n_bins = band.stop - band.start
+    # Output rows are written in place; the buffer grows geometrically with ndarray.resize
+    # (a realloc, so old and new storage are never both held) and is trimmed at the end
+    S = np.empty((0, n_bins), dtype=np.float32)
+    n_done = 0
+    carry = np.zeros(0, dtype=np.float32)
+
+    for block in blocks:
+        buf = np.concatenate((carry, block)) if carry.size else block
+        if len(buf) < n_fft:
+            carry = buf
+            continue
+
+        n_frames = 1 + (len(buf) - n_fft) // hop_length
+        D = _stft(buf[:(n_frames - 1) * hop_length + n_fft], n_fft=n_fft, hop_length=hop_length)
+
+        if n_done + n_frames > S.shape[0]:
+            S.resize((max(n_done + n_frames, 2 * S.shape[0]), n_bins), refcheck=False)
+
+        # Power -> dB on in-band rows only, fused into one pass (librosa.power_to_db defaults)
+        _band_power_db(D, band.start, band.stop, 1.0, 1e-10, S[n_done:n_done + n_frames])
+        n_done += n_frames
+        carry = buf[n_frames * hop_length:]
+
+    if not n_done:
+        raise ValueError(f"Audio is shorter than one {n_fft}-sample frame")
+
+    S.resize((n_done, n_bins), refcheck=False)
+    _apply_top_db(S, 80.0)
+    return S.T
+
 def get_spectrogram(
     y: np.ndarray,
     sr: int,
@@ -39,157 +214,191 @@ def get_spectrogram(
     fmax: float = 3000.0,
 ) -> np.ndarray:
     """Compute log-power spectrogram, optionally restricted to [fmin, fmax] Hz."""
-    # Compute magnitude power spectrogram
-    S = np.abs(librosa.stft(
-        y, n_fft=n_fft, hop_length=hop_length,
-        center=False, # no padding
-        window='hann', # smooth fade-in/out
-        )) ** 2
-
-    # Convert power to decibels
-    log_S = librosa.power_to_db(S, ref=1.0)
-
-    # Get the actual frequency axis (in Hz)
-    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
-
-    # Find frequency bin indices for the desired range
-    freq_mask = (freqs >= fmin) & (freqs <= fmax)
-
-    # Apply the mask to keep only rows (frequencies) within the range
-    log_S_band = log_S[freq_mask, :]
-
-    return log_S_band
+    return stream_spectrogram([y], sr, n_fft, hop_length, fmin, fmax)
 
 
 def find_peaks(
     S: np.ndarray,
     neighborhood_size=(25, 25),
     threshold=-30.0,
-    eps=1e-6
+    eps=0.05
 ) -> np.ndarray:
-    # Quantize to suppress floating-point jitter
-    S_q = np.round(S, decimals=1)
+    # Stay in float32 so the filter and comparisons move half the bytes of float64
+    S = np.asarray(S, dtype=np.float32)
+    threshold = np.float32(threshold)
+    eps = np.float32(eps)
 
     # Compute neighborhood with deterministic padding
-    neighborhood = maximum_filter(S_q, size=neighborhood_size, mode='nearest')
+    # (a rectangular `size` is already applied as separable 1-D passes by scipy)
+    neighborhood = maximum_filter(S, size=neighborhood_size, mode='nearest')
+
+    # Tolerance of half a 0.1 dB step stands in for quantizing S to suppress jitter
+    peaks = (S >= neighborhood - eps) & (S > threshold)
+
+    # Return (freq_bin, frame) coordinates of detected peaks
+    return np.argwhere(peaks).astype(np.int32)
+
+@njit(cache=True)
+def _rate_limit_mask(t1s: np.ndarray, window: int, max_per_window: int) -> np.ndarray:
+    """Single pass over t1 values; keep[i] is True if candidate i survives the rolling cap."""
+    n = t1s.shape[0]
+    keep = np.zeros(n, dtype=np.bool_)
+    recent = np.empty(n, dtype=t1s.dtype)  # t1 of kept items; [head, tail) is the live window
+    head = 0
+    tail = 0
+
+    for i in range(n):
+        t1 = t1s[i]
+        # evict items older than the window from the front
+        while head < tail and (t1 - recent[head]) >= window:
+            head += 1
 
-    # Allow tiny tolerance for “equal to max”
-    peaks = (S_q >= neighborhood - eps) & (S_q > threshold)
+        if tail - head < max_per_window:
+            keep[i] = True
+            recent[tail] = t1
+            tail += 1
 
-    # Return coordinates of detected peaks
-    return np.argwhere(peaks)
+    return keep
 
 def deterministic_rate_limit(
-    candidates: list[tuple[int, int, int, int]],
+    candidates: np.ndarray,
     max_per_second: int,
     *,
     sample_rate: int = SAMPLE_RATE,
     hop_length: int = HOP_LENGTH,
-) -> list[tuple[int, int, int, int]]:
+) -> np.ndarray:
     """
     Cap to at most `max_per_second` pairs in any rolling 1-second window (measured in frames).
     candidates must be sorted in a canonical order beforehand (see call site).
-    Each candidate is (t1_frame, f1, f2, dt_frames).
+    Each candidate row is (t1_frame, f1, f2, dt_frames).
     """
     if not max_per_second:
         return candidates
 
     W = sample_rate // hop_length        # frames in ~1 second (e.g., 16000/256=62)
-    kept = []
-    recent = deque()                     # stores t1 of kept items within the last 1s window
+    keep = _rate_limit_mask(np.ascontiguousarray(candidates[:, 0]), W, max_per_second)
+    return candidates[keep]
+
+@njit(cache=True)
+def _build_pairs(
+    fs: np.ndarray,
+    ts: np.ndarray,
+    max_delta: int,
+    fan_value: int,
+    dt_bucket: int,
+) -> np.ndarray:
+    """
+    Pair every anchor with the first `fan_value` later peaks inside `max_delta` frames.
+    fs/ts must be sorted by (time, freq). Returns an (N, 4) int32 array of (t1, f1, f2, dt).
+    """
+    n = fs.shape[0]
+    out = np.empty((n * fan_value, 4), dtype=np.int32)
+    count = 0
+    if n == 0:
+        return out
+
+    # Anchors in the last frame have no later target, so stop before them
+    n_anchors = np.searchsorted(ts, ts[n - 1], side="left")
+    for i in range(n_anchors):
+        f1 = fs[i]
+        t1 = ts[i]
+
+        # Pair with the first K targets that are within the time window
+        taken = 0
+        for k in range(i + 1, n):
+            dt = ts[k] - t1
+            if dt <= 0:
+                continue
+            if dt > max_delta:
+                break  # peaks are time-sorted, so we can stop scanning
 
-    for t1, f1, f2, dt in candidates:
-        # evict items older than 1 second from the front
-        while recent and (t1 - recent[0]) >= W:
-            recent.popleft()
+            # quantize dt in frames for stability
+            if dt_bucket > 1:
+                dt = (dt // dt_bucket) * dt_bucket
 
-        if len(recent) < max_per_second:
-            kept.append((t1, f1, f2, dt))
-            recent.append(t1)
+            out[count, 0] = t1
+            out[count, 1] = f1
+            out[count, 2] = fs[k]
+            out[count, 3] = dt
+            count += 1
+            taken += 1
+            if taken >= fan_value:
+                break  # cap fanout per anchor inside the window
 
-    return kept
+    return out[:count]
 
 def generate_hashes(
-    peaks: Sequence[Sequence[int]],
+    peaks: np.ndarray,
     *,
     fan_value: int = FAN_VALUE,
     max_delta: int = MAX_DELTA_FRAMES,
     max_hashes_per_second: int = MAX_HASHES_PER_SECOND,
     dt_bucket = 2
-) -> List[Tuple[str, int]]:
+) -> Tuple[np.ndarray, np.ndarray]:
     """
     Deterministic landmark hashing with origin-invariant rate limiting.
-    Returns: list of (hash:str, t_ref_frame:int)
+    Returns: aligned int64 arrays (hashes, t_ref_frames)
     """
     if len(peaks) == 0:
-        return []
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
 
-    # Canonicalize peaks first: (time, then freq)
-    peaks_sorted = sorted(((int(f), int(t)) for f, t in peaks), key=lambda p: (p[1], p[0]))
+    # Canonicalize peaks first: (time, then freq), kept as separate freq/time columns
+    peaks = np.asarray(peaks, dtype=np.int32).reshape(-1, 2)
+    order = np.lexsort((peaks[:, 0], peaks[:, 1]))
+    fs = peaks[order, 0]
+    ts = peaks[order, 1]
 
     # Build ALL candidate pairs (no second buckets)
     # Each candidate: (t1, f1, f2, dt)
-    candidates: List[Tuple[int, int, int, int]] = []
-    for i in range(len(peaks_sorted)):
-        f1, t1 = peaks_sorted[i]
-
-        # Pair with the first K targets that are within the time window
-        taken = 0
-        for k in range(i + 1, len(peaks_sorted)):
-            f2, t2 = peaks_sorted[k]
-            dt = t2 - t1
-            if dt <= 0:
-                continue
-            if dt > max_delta:
-                break  # peaks_sorted is time-sorted, so we can stop scanning
-
-            # quantize dt in frames for stability
-            if dt_bucket > 1:
-                dt = (dt // dt_bucket) * dt_bucket
-
-            candidates.append((t1, f1, f2, dt))
-            taken += 1
-            if taken >= fan_value:
-                break  # cap fanout per anchor inside the window
-
+    pairs = _build_pairs(
+        fs,
+        ts,
+        max_delta,
+        fan_value,
+        dt_bucket,
+    )
+    candidates = pairs.astype(np.int64)
 
     # Canonical global order BEFORE limiting
     # Pick any fixed, total ordering; this one is stable and simple.
-    # Primary by t1 (time), then dt, then f1, f2.
-    candidates.sort(key=lambda x: (x[0], x[3], x[1], x[2]))
+    # Primary by t1 (time), then dt, then f1, f2 (lexsort takes the primary key last).
+    order = np.lexsort((candidates[:, 2], candidates[:, 1], candidates[:, 3], candidates[:, 0]))
+    candidates = candidates[order]
 
     # 4) Origin-invariant rate limit: at most K per rolling ~1 second
-    candidates = deterministic_rate_limit(
+    cand = deterministic_rate_limit(
         candidates,
         max_hashes_per_second,
         sample_rate=SAMPLE_RATE,
         hop_length=HOP_LENGTH,
     )
 
-    # Hash deterministically
-    hashes: List[Tuple[str, int]] = []
-    for t1, f1, f2, dt in candidates:
-        hash_input = f"{f1}|{f2}|{dt}"
-        h = hashlib.sha1(hash_input.encode("utf-8")).hexdigest()[:20]
-        hashes.append((h, t1))
+    # Hash deterministically: bit-pack (f1, f2, dt) into one 64-bit integer
+    packed = (cand[:, 1] << HASH_F1_SHIFT) | (cand[:, 2] << HASH_F2_SHIFT) | cand[:, 3]
+    t_refs = cand[:, 0]
+
+    # Final canonical sort for stable output comparisons: (t_ref_frame, hash)
+    order = np.lexsort((packed, t_refs))
+    packed = packed[order]
+    t_refs = t_refs[order]
 
-    # Final canonical sort for stable output comparisons
-    hashes.sort(key=lambda x: (x[1], x[0]))  # (t_ref_frame, hash)
+    # Remove duplicates (identical rows are adjacent after the sort)
+    keep = np.empty(len(packed), dtype=np.bool_)
+    keep[:1] = True
+    keep[1:] = (packed[1:] != packed[:-1]) | (t_refs[1:] != t_refs[:-1])
 
-    # Remove duplicates while keeping order
-    hashes = list(dict.fromkeys(hashes))
-    return hashes
+    return packed[keep], t_refs[keep]
 
 
-def segment_fingerprint(fingerprint):
+def segment_fingerprint(hashes: np.ndarray, t_refs: np.ndarray):
     """
-    Takes a fingerprint (list of (hash, frame) tuples), determines how many
+    Takes a fingerprint (aligned hash / frame arrays), determines how many
     segments to create and how many hashes per segment based on fingerprint length,
     and returns both the parameters and the segmented fingerprint.
 
     Output:
         {
-            "segments": [ ... ],
+            "segments": (hashes, t_refs),
             "info": {
                 "length": int,
                 "segments": int,
@@ -198,35 +407,25 @@ def segment_fingerprint(fingerprint):
             }
         }
     """
-    L = len(fingerprint)
+    L = len(hashes)
 
     # Handle very short fingerprints
     if L < 1000:
         return {
-            "segments": fingerprint,
+            "segments": (hashes, t_refs),
             "info": {"length": L, "segments": 1, "hashes_per_segment": L, "coverage": 1.0}
         }
 
-    # Define scaling anchors (length, per_section, coverage, min_sections, max_sections)
-    anchors = [
-        (1000,   50, 0.25, 5, 25),
-        (5000,   80, 0.20, 10, 30),
-        (15000, 120, 0.15, 15, 40),
-        (50000, 160, 0.075, 20, 50),
-        (100000,200, 0.05, 50, 50),
-    ]
-
-    # Determine scale parameters from anchors
-    for i in range(len(anchors) - 1):
-        start, p_start, c_start, smin_start, smax_start = anchors[i]
-        end, p_end, c_end, smin_end, smax_end = anchors[i + 1]
-        if start <= L < end:
-            t = (L - start) / (end - start)
-            per_section = p_start + (t ** 0.5) * (p_end - p_start)
-            coverage = c_start + t * (c_end - c_start)
-            smin = smin_start + t * (smin_end - smin_start)
-            smax = smax_start + t * (smax_end - smax_start)
-            break
+    # Determine scale parameters from the anchor bracketing L
+    i = bisect.bisect_right(_SEGMENT_ANCHOR_LENGTHS, L) - 1
+    if i < len(SEGMENT_ANCHORS) - 1:
+        start, p_start, c_start, smin_start, smax_start = SEGMENT_ANCHORS[i]
+        end, p_end, c_end, smin_end, smax_end = SEGMENT_ANCHORS[i + 1]
+        t = (L - start) / (end - start)
+        per_section = p_start + (t ** 0.5) * (p_end - p_start)
+        coverage = c_start + t * (c_end - c_start)
+        smin = smin_start + t * (smin_end - smin_start)
+        smax = smax_start + t * (smax_end - smax_start)
     else:
         per_section, coverage, smin, smax = 200, 0.05, 50, 50
 
@@ -238,18 +437,14 @@ def segment_fingerprint(fingerprint):
     actual_coverage = (sections * per_section) / L
 
     # Perform even-interval segmentation
-    total = len(fingerprint)
+    total = len(hashes)
     step = total // sections
-    fingerprint_segments = []
-
-    for i in range(int(sections)):
-        start = int(i * step)
-        end = start + int(round(per_section))
-        if end > total:
-            end = total
-        segment = fingerprint[start:end]
-        if len(segment) > 0:  # avoid empty tail
-            fingerprint_segments.extend(segment)
+    seg_len = int(round(per_section))
+    spans = [(int(i * step), min(int(i * step) + seg_len, total)) for i in range(int(sections))]
+    fingerprint_segments = (
+        np.concatenate([hashes[start:end] for start, end in spans]),
+        np.concatenate([t_refs[start:end] for start, end in spans]),
+    )
 
     return {
         "segments": fingerprint_segments,
@@ -262,26 +457,37 @@ def segment_fingerprint(fingerprint):
     }
 
 
-def fingerprint_audio(path: str) -> List[Tuple[str, int]]:
-    """Full pipeline: load audio, compute spectrogram, extract hashes."""
+def fingerprint_audio(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Full pipeline: stream-decode audio, compute spectrogram, extract (hashes, t_refs)."""
     print("Creating fingerprint!\n")
-    y, sr = load_audio(path)
-    S = get_spectrogram(y, sr)
+    S = stream_spectrogram(stream_audio(path), SAMPLE_RATE)
     peaks = find_peaks(S)
-    hashes = generate_hashes(peaks)
-    return hashes
+    return generate_hashes(peaks)
+
+
+def _warmup_kernels() -> None:
+    """
+    Compile every numba kernel with the argument types used at runtime. With cache=True the
+    machine code is written to __pycache__ once, so later processes only load it from disk.
+    """
+    D = _stft(np.zeros(N_FFT + HOP_LENGTH, dtype=np.float32))
+    S = np.empty((D.shape[1], 1), dtype=np.float32)
+    _band_power_db(D, 0, 1, 1.0, 1e-10, S)
+    _apply_top_db(S, 80.0)
+    frames = np.arange(4, dtype=np.int32)
+    _build_pairs(frames, frames, MAX_DELTA_FRAMES, FAN_VALUE, DT_BUCKET_FRAMES)
+    _rate_limit_mask(frames.astype(np.int64), SAMPLE_RATE // HOP_LENGTH, MAX_HASHES_PER_SECOND)
+
+
+_warmup_kernels()
 
 
 if __name__ == "__main__":
-    fingerprint = fingerprint_audio("./testing/data/test_audio/audio_file_1.mp3")
-    # segments = segment_fingerprint(fingerprint)
+    hashes, t_refs = fingerprint_audio("./testing/data/test_audio/audio_file_1.mp3")
+    # segments = segment_fingerprint(hashes, t_refs)
     # for key, value in segments["info"].items():
     #     print(f"{key}: {value}")
-    # for idx, pair_1 in enumerate(fingerprint):
-    #     pair_2 = fingerprint[idx+1]
-    #     dt = pair_2[1] - pair_1[1]
-    #     print(pair_1[0], pair_2[0], dt, pair_1[1])
-    print(len(fingerprint))
-    for f in fingerprint:
-        print(f)
+    print(len(hashes))
+    for h, t in zip(hashes.tolist(), t_refs.tolist()):
+        print((h, t))
 
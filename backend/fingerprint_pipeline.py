@@ -1,4 +1,6 @@
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Optional
@@ -21,12 +23,31 @@ from download import (
 
 # --- Config ---
 DOWNLOAD_TMP_DIR = Path(os.getenv("DOWNLOAD_TMP_DIR", "data"))
+# Background thread for GCS uploads so they overlap with fingerprinting
+UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gcs-upload")
 
 # --- Helpers ---
-def store_fingerprint(conn, video_uuid, fingerprint):
+def store_fingerprint(conn, video_uuid, hashes, t_refs):
     """Store fingerprint in the database."""
     print(f"Storing Fingerprint\nID: {video_uuid}")
-    return ingest_video_fingerprints(conn, video_uuid, fingerprint)
+    return ingest_video_fingerprints(conn, video_uuid, hashes, t_refs)
+
+def pick_top_match(matches):
+    """
+    Histogram matcher hits by (video_id, delta) and return the bin with the most
+    matches once its +/-1 frame neighbors are merged in. Ties go to the bin the
+    matcher ranked first.
+    """
+    hist = Counter()
+    for m in matches:
+        hist[(m["video_id"], m["delta"])] += m["matches"]
+
+    top_match = None
+    for (video_id, delta) in hist:
+        score = hist[(video_id, delta - 1)] + hist[(video_id, delta)] + hist[(video_id, delta + 1)]
+        if top_match is None or score > top_match["matches"]:
+            top_match = {"video_id": video_id, "delta": delta, "matches": score}
+    return top_match
 
 # --- Main Workflow ---
 def process_videos(limit: int = 1):
@@ -53,19 +74,26 @@ def process_videos(limit: int = 1):
 
             try:
                 # --- Download & Upload ---
+                upload = None
                 try:
                     audio_path = download_from_gcs(bucket, DOWNLOAD_TMP_DIR, object_name)
                     if not audio_path:
                         url = youtube_url(youtube_video_id)
                         audio_path = download_audio(url, youtube_video_id, DOWNLOAD_TMP_DIR)
                         print("\nUploading to Cloud Bucket!")
-                        upload_to_gcs(bucket, audio_path, object_name)
+                        upload = UPLOAD_EXECUTOR.submit(upload_to_gcs, bucket, audio_path, object_name)
 
-                    # --- Fingerprint Generation ---
-                    fingerprint = fingerprint_audio(audio_path)
-                    fingerprint_length = len(fingerprint)
+                    # --- Fingerprint Generation (runs while the upload is in flight) ---
+                    hashes, t_refs = fingerprint_audio(audio_path)
+                    fingerprint_length = len(hashes)
                     print(f"[Pipeline] Fingerprint length: {fingerprint_length}")
+
+                    if upload is not None:
+                        upload.result()  # surface upload errors for this video
                 finally:
+                    # Never delete the local file while it is still being uploaded
+                    if upload is not None:
+                        wait([upload])
                     try: audio_path.unlink(missing_ok=True)
                     except Exception: pass
 
@@ -78,19 +106,15 @@ def process_videos(limit: int = 1):
                         continue
 
                     # --- Segment & Match ---
-                    seg = segment_fingerprint(fingerprint)
-                    segments = seg["segments"]
+                    seg = segment_fingerprint(hashes, t_refs)
+                    seg_hashes, seg_t_refs = seg["segments"]
                     segment_info = seg["info"]
                     print(f"[Pipeline] Segment info: {segment_info}")
-                    matches = find_fingerprint_candidates(conn, segments)
+                    matches = find_fingerprint_candidates(conn, seg_hashes, seg_t_refs)
 
                     if matches:
                         print(f"[Pipeline] {len(matches)} candidates returned from matcher.")
-                        top_match = matches[0]
-                        # Merge close deltas
-                        for m in matches[1:]:
-                            if abs(m["delta"] - top_match["delta"]) <= 1 and m["video_id"] == top_match["video_id"]:
-                                top_match["matches"] += m["matches"]
+                        top_match = pick_top_match(matches)
 
                         match_percentage = top_match["matches"] / segment_info["length"]
                         print(
@@ -106,7 +130,7 @@ def process_videos(limit: int = 1):
                             continue
 
                     # --- Store if no good match ---
-                    store_fingerprint(conn, video_uuid, fingerprint)
+                    store_fingerprint(conn, video_uuid, hashes, t_refs)
 
 
             except KeyboardInterrupt as k:
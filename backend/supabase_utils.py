@@ -1,50 +1,81 @@
 import psycopg
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
 from dotenv import load_dotenv
-from typing import Optional, Iterable, Tuple, Mapping
-from collections import Counter
-import json
+from typing import Optional, Mapping
+import numpy as np
+import logging
 import os
+import uuid
 
 
 # Load environment variables from the .env file so credentials like user, password, and host are available
 load_dotenv()
 
+# DB logging: chunk-level detail at DEBUG, one summary line per operation at INFO.
+# Disabled levels are dropped by a level check before any message formatting happens.
+log = logging.getLogger("sonicgen.db")
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("[DB] %(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(os.getenv("DB_LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+
+# Executions before psycopg prepares a statement server-side; empty/unset disables prepares.
+# Only set this for a direct or session-mode connection, never the transaction pooler (port 6543).
+_prepare_threshold = os.getenv("PG_PREPARE_THRESHOLD", "").strip()
+PG_PREPARE_THRESHOLD = int(_prepare_threshold) if _prepare_threshold else None
+
+# Below this many rows a single UNNEST INSERT beats COPY's setup round-trips
+COPY_MIN_ROWS = 1024
+
+def _configure_conn(conn: psycopg.Connection) -> None:
+    """Runs once per physical connection as the pool opens it."""
+    # Server-side prepared statements break behind Supabase's transaction-mode pooler
+    # (PREPARE and EXECUTE can land on different backends), so they stay off by default
+    conn.prepare_threshold = PG_PREPARE_THRESHOLD
+    log.info("Connection established.")
+
+
+# One pool per process: the TLS handshake + startup cost is paid once per physical connection,
+# not on every get_conn() call
+POOL = ConnectionPool(
+    min_size=1,
+    max_size=int(os.getenv("PG_POOL_MAX_SIZE", 8)),
+    kwargs={
+        "user": os.getenv("PG_USER"),
+        "password": os.getenv("PG_PASSWORD"),
+        "host": os.getenv("PG_HOST"),
+        "port": os.getenv("PG_PORT"),
+        "dbname": os.getenv("PG_DBNAME"),
+        "sslmode": "require",  # enforce SSL for security when connecting to Supabase
+        "row_factory": dict_row,
+    },
+    configure=_configure_conn,
+    # Connections can sit idle through minutes of decoding/STFT; validate on checkout so a
+    # connection dropped by the server or network is replaced instead of failing the video
+    check=ConnectionPool.check_connection,
+    open=False,
+)
+
+
 def get_conn():
     """
-    Establish a secure connection to the PostgreSQL database using credentials from environment variables.
-    Returns an active psycopg connection object if successful, or raises a RuntimeError if the connection fails.
+    Borrow a connection from the shared pool (opened on first use).
+    Use as a context manager: the transaction is committed (or rolled back on error)
+    and the connection returned to the pool when the block exits.
     """
-    USER = os.getenv("PG_USER")
-    PASSWORD = os.getenv("PG_PASSWORD")
-    HOST = os.getenv("PG_HOST")
-    PORT = os.getenv("PG_PORT")
-    DBNAME = os.getenv("PG_DBNAME")
-
-    try:
-        connection = psycopg.connect(
-            user=USER,
-            password=PASSWORD,
-            host=HOST,
-            port=PORT,
-            dbname=DBNAME,
-            sslmode="require",  # enforce SSL for security when connecting to Supabase
-            row_factory=dict_row,
-        )
-        print("[DB] Connection established.")
-        return connection
-    except Exception as e:
-        raise RuntimeError(f"Database connection failed: {e}")
+    POOL.open()  # no-op once the pool is open
+    return POOL.connection()
 
-def aggregate_hash_counts(occurrences: Iterable[Tuple[str, int]]) -> Mapping[str, int]:
+def aggregate_hash_counts(hashes: np.ndarray) -> Mapping[int, int]:
     """hash -> total_count for this video only."""
-    c = Counter()
-    for h, _ in occurrences:
-        c[str(h)] += 1
-    return c
+    unique, counts = np.unique(np.asarray(hashes, dtype=np.int64), return_counts=True)
+    return dict(zip(unique.tolist(), counts.tolist()))
 
 
-def upsert_fingerprint_hashes(conn: psycopg.Connection, hash_counts: Mapping[str, int]) -> None:
+def upsert_fingerprint_hashes(conn: psycopg.Connection, hash_counts: Mapping[int, int]) -> None:
     """
     Adds to total_count for all hashes and increments video_count by +1.
     If a hash is new, inserts it with total_count = count, video_count = 1.
@@ -54,14 +85,14 @@ def upsert_fingerprint_hashes(conn: psycopg.Connection, hash_counts: Mapping[str
 
     hashes = list(hash_counts.keys())
     totals = list(hash_counts.values())
-    print(f"[DB] Upserting {len(hashes)} unique hashes into fingerprint_hashes.")
+    log.debug("Upserting %d unique hashes into fingerprint_hashes.", len(hashes))
 
     with conn.cursor() as cur:
         cur.execute(
             """
             INSERT INTO public.fingerprint_hashes (hash, total_count, video_count)
             SELECT u.hash, u.c, 1
-            FROM UNNEST(%s::text[], %s::bigint[]) AS u(hash, c)
+            FROM UNNEST(%s::bigint[], %s::bigint[]) AS u(hash, c)
             ON CONFLICT (hash)
             DO UPDATE
               SET total_count = fingerprint_hashes.total_count + EXCLUDED.total_count,
@@ -71,93 +102,108 @@ def upsert_fingerprint_hashes(conn: psycopg.Connection, hash_counts: Mapping[str
         )
 
 
-def insert_fingerprint(conn, video_id: str, occurrences, chunk_size: int = 5000):
+def insert_fingerprint(
+    conn,
+    video_id: str,
+    hashes: np.ndarray,
+    t_refs: np.ndarray,
+):
     """
-    Insert fingerprint occurrences for a given video in chunks to avoid statement timeouts.
+    Insert fingerprint occurrences for a given video (does not commit).
+    `hashes` and `t_refs` are aligned arrays, one entry per occurrence.
+    Large batches stream through a binary COPY; batches under COPY_MIN_ROWS go in one
+    UNNEST INSERT, where COPY's setup cost isn't worth it.
     """
-
-    # Normalize input data into a list of tuples (hash, video_id, t_ref)
-    rows = [(str(item["hash"]), video_id, int(item["t_ref"]))
-            if isinstance(item, dict)
-            else (str(item[0]), video_id, int(item[1]))
-            for item in occurrences]
-
-    if not rows:
+    n_rows = len(hashes)
+    if not n_rows:
         return 0
 
-    total_inserted = 0
-    print(f"[DB] Inserting {len(rows)} fingerprint rows for video {video_id}.")
+    hash_values = np.asarray(hashes).tolist()
+    t_ref_values = np.asarray(t_refs).tolist()
+    # Parsed once and reused: binary COPY encodes uuid columns from UUID objects only
+    video_uuid = video_id if isinstance(video_id, uuid.UUID) else uuid.UUID(str(video_id))
+
+    log.debug("Inserting %d fingerprint rows for video %s.", n_rows, video_id)
     with conn.cursor() as cur:
-        for i in range(0, len(rows), chunk_size):
-            chunk = rows[i:i + chunk_size]
-            cur.executemany(
-                "INSERT INTO fingerprints (hash, video_id, t_ref) VALUES (%s, %s, %s)",
-                chunk
+        if n_rows >= COPY_MIN_ROWS:
+            with cur.copy(
+                "COPY fingerprints (hash, video_id, t_ref) FROM STDIN (FORMAT BINARY)"
+            ) as copy:
+                copy.set_types(["int8", "uuid", "int4"])
+                for h, t in zip(hash_values, t_ref_values):
+                    copy.write_row((h, video_uuid, t))
+            log.debug("Copied %d rows.", n_rows)
+        else:
+            # video_id is bound once as a scalar rather than repeated per row
+            cur.execute(
+                """
+                INSERT INTO fingerprints (hash, video_id, t_ref)
+                SELECT u.h, %s::uuid, u.t
+                FROM UNNEST(%s::bigint[], %s::int[]) AS u(h, t)
+                """,
+                (video_uuid, hash_values, t_ref_values),
             )
-            total_inserted += len(chunk)
-            conn.commit()  # commit after each chunk so we don't lose progress if it fails
-            print(f"[DB] Committed chunk {(i // chunk_size) + 1} ({len(chunk)} rows).")
-
-        # Mark video as fingerprinted once all chunks are inserted
-        cur.execute("UPDATE videos SET match_status = %s WHERE id = %s", ("fingerprinted", video_id))
-        conn.commit()
-        print(f"[DB] Video {video_id} marked as fingerprinted.")
-
-    return total_inserted
+            log.debug("Inserted %d rows.", n_rows)
 
+    return n_rows
 
 
 def ingest_video_fingerprints(
     conn,
     video_id: str,
-    occurrences: Iterable[Tuple[str, int]]
+    hashes: np.ndarray,
+    t_refs: np.ndarray,
 ) -> int:
     """
-    End-to-end ingest for one video:
+    End-to-end ingest for one video, committed as one transaction:
+      - insert the occurrences (aligned hash / t_ref arrays)
       - upsert hash totals (+1 video_count where new to this video)
-      - insert the occurrences
+      - mark the video as fingerprinted
     """
-    # Materialize occurrences once (we iterate twice)
-    occ_list = [(str(h), int(t)) for h, t in occurrences]
-    per_hash = aggregate_hash_counts(occ_list)
-    print(f"[DB] Prepared {len(occ_list)} occurrences across {len(per_hash)} unique hashes for video {video_id}.")
-
-    # One transaction for correctness + speed
-    upsert_fingerprint_hashes(conn, per_hash)
-    row_length = insert_fingerprint(conn, video_id, occ_list)
+    per_hash = aggregate_hash_counts(hashes)
+    log.debug("Prepared %d occurrences across %d unique hashes for video %s.", len(hashes), len(per_hash), video_id)
+
+    # One transaction for correctness + speed.
+    # COPY can't run in pipeline mode, so the occurrence rows are written first.
+    row_length = insert_fingerprint(conn, video_id, hashes, t_refs)
+
+    # Nothing below needs an intermediate result: pipeline it instead of waiting per statement
+    with conn.pipeline():
+        upsert_fingerprint_hashes(conn, per_hash)
+        with conn.cursor() as cur:
+            cur.execute("UPDATE videos SET match_status = %s WHERE id = %s", ("fingerprinted", video_id))
+        conn.commit()
+    log.info("Stored %d fingerprint rows; video %s marked as fingerprinted.", row_length, video_id)
+
     return row_length
 
 
-def find_fingerprint_candidates(conn, occurrences, *,
+def find_fingerprint_candidates(conn, hashes, t_refs, *,
     ignore_fraction=0.01, min_matches=6,
     max_hits_per_hash=1000, limit_candidates=50):
     """
     Call the Postgres function find_fingerprint_candidates(...) directly to find matching videos
     given a clip's fingerprint occurrences.
 
-    Converts the list of (hash, t_ref) pairs into JSON so it can be passed to the SQL function.
+    The aligned (hash, t_ref) arrays are bound directly as bigint[] / int[] arguments.
 
     Args:
         conn: Active psycopg connection
-        occurrences: Iterable of dicts or tuples containing (hash, t_ref)
+        hashes, t_refs: Aligned sequences of landmark hashes and their reference frames
         ignore_fraction, min_matches, max_hits_per_hash, limit_candidates: Parameters controlling match logic
 
     Returns:
         List of candidate rows returned by the database function.
     """
-    # Convert Python occurrences into JSON for Postgres' JSONB argument
-    occ_payload = [
-        {"hash": str(o["hash"]), "t_ref": int(o["t_ref"])}
-        if isinstance(o, dict) else {"hash": str(o[0]), "t_ref": int(o[1])}
-        for o in occurrences
-    ]
-    print(f"[DB] Sending {len(occ_payload)} occurrences to matcher.")
-    occ_json = json.dumps(occ_payload)
+    hash_values = np.asarray(hashes).tolist()
+    t_ref_values = np.asarray(t_refs).tolist()
+    log.debug("Sending %d occurrences to matcher.", len(hash_values))
 
     # SQL query calling the Postgres stored function directly
     query = """
         SELECT * FROM find_fingerprint_candidates(
-            %(occurrences)s::jsonb,
+            %(hashes)s::bigint[],
+            %(t_refs)s::int[],
             %(ignore_fraction)s,
             %(min_matches)s,
             %(max_hits_per_hash)s,
@@ -168,57 +214,152 @@ def find_fingerprint_candidates(conn, occurrences, *,
     # Execute the query and fetch all resulting candidate rows
     with conn.cursor() as cur:
         cur.execute(query, {
-            "occurrences": occ_json,
+            "hashes": hash_values,
+            "t_refs": t_ref_values,
             "ignore_fraction": ignore_fraction,
             "min_matches": min_matches,
             "max_hits_per_hash": max_hits_per_hash,
             "limit_candidates": limit_candidates
         })
         rows = cur.fetchall()
-        print(f"[DB] Matcher returned {len(rows)} candidate rows.")
+        log.info("Matcher returned %d candidate rows.", len(rows))
         return rows
 
 
-def fetch_occurrences_by_video(conn, video_id, limit=10000):
+def fetch_occurrences_by_video(conn, video_id, cursor: Optional[dict] = None, limit=10000):
     """
-    Retrieve up to 'limit' fingerprint_occurrence rows associated with a given video_id.
+    Retrieve the next page of fingerprint rows for a given video_id using keyset pagination,
+    ordered by (t_ref, hash) — unique per video since (hash, video_id, t_ref) is the primary key.
 
     Args:
         conn: Active psycopg connection
         video_id: Video UUID or ID to query
+        cursor: Dictionary containing 't_ref' and 'hash' from the last fetched row
+                (used as the keyset position for the next page)
         limit: Maximum number of rows to fetch
 
     Returns:
-        List of (hash, video_id, t_ref) rows.
+        Tuple of:
+          - rows: List of (hash, video_id, t_ref) rows
+          - next_cursor: Dictionary representing the last row's keyset (for the next call)
     """
     with conn.cursor() as cur:
-        cur.execute(
-            "SELECT hash, video_id, t_ref FROM fingerprints WHERE video_id = %s LIMIT %s",
-            (video_id, limit)
-        )
-        return cur.fetchall()
+        if cursor is None:
+            cur.execute(
+                "SELECT hash, video_id, t_ref FROM fingerprints "
+                "WHERE video_id = %s ORDER BY t_ref, hash LIMIT %s",
+                (video_id, limit)
+            )
+        else:
+            cur.execute(
+                "SELECT hash, video_id, t_ref FROM fingerprints "
+                "WHERE video_id = %s AND (t_ref, hash) > (%s, %s) "
+                "ORDER BY t_ref, hash LIMIT %s",
+                (video_id, cursor["t_ref"], cursor["hash"], limit)
+            )
+        rows = cur.fetchall()
 
+    next_cursor = None
+    if rows:
+        last = rows[-1]
+        next_cursor = {"t_ref": last["t_ref"], "hash": last["hash"]}
+    return rows, next_cursor
 
-def fetch_occurrences_for_hashes(conn, hashes, limit_per_hash=2000):
+
+def fetch_occurrences_for_hashes(conn, hashes, limit_per_hash=2000, itersize=5000):
     """
     Fetch occurrences for a list of specific hash values.
     Useful for inspecting which videos a given set of hashes appears in.
 
+    Rows are streamed through a server-side cursor, `itersize` at a time,
+    so the full result set is never held in memory. Must be consumed inside a transaction.
+
     Args:
         conn: Active psycopg connection
-        hashes: Sequence of hash strings
+        hashes: Sequence of integer landmark hashes
         limit_per_hash: Maximum number of rows to return per hash
+        itersize: Rows fetched from the server per round-trip
 
-    Returns:
-        List of matching (hash, video_id, t_ref) rows.
+    Yields:
+        Matching (hash, video_id, t_ref) rows.
     """
-    with conn.cursor() as cur:
+    with conn.cursor(name="occ_fetch") as cur:
+        cur.itersize = itersize
         cur.execute(
             "SELECT hash, video_id, t_ref FROM fingerprints "
-            "WHERE hash = ANY(%s) LIMIT %s",
+            "WHERE hash = ANY(%s::bigint[]) LIMIT %s",
             (list(hashes), limit_per_hash)
         )
-        return cur.fetchall()
+        yield from cur
+
+
+def upsert_videos(
+    conn,
+    videos,
+    channel_id: str,
+    batch_size: int = 10000,
+    published_after=None,
+    published_before=None,
+) -> int:
+    """
+    Upsert YouTube video metadata rows (as built by youtube_api.get_video_metadata)
+    for one channel, keyed on youtube_id (does not commit).
+    Durations arrive as integer seconds and become INTERVALs server-side.
+    Each batch is one UNNEST statement: parallel column arrays instead of per-row values.
+    Rows without a publish date, or outside [published_after, published_before], are skipped in SQL.
+
+    Returns:
+        Number of rows inserted or updated.
+    """
+    if not videos:
+        return 0
+
+    upserted = 0
+    with conn.cursor() as cur:
+        for i in range(0, len(videos), batch_size):
+            batch = videos[i:i + batch_size]
+            cur.execute(
+                """
+                INSERT INTO public.videos (youtube_id, title, description, published_at, duration, channel_id)
+                SELECT u.youtube_id, u.title, u.description, u.published_at,
+                       make_interval(secs => u.duration_s), %(channel_id)s
+                FROM UNNEST(
+                    %(youtube_ids)s::text[], %(titles)s::text[], %(descriptions)s::text[],
+                    %(published_ats)s::timestamptz[], %(durations)s::int[]
+                ) AS u(youtube_id, title, description, published_at, duration_s)
+                WHERE u.published_at IS NOT NULL
+                  AND (%(after)s::timestamptz IS NULL OR u.published_at >= %(after)s::timestamptz)
+                  AND (%(before)s::timestamptz IS NULL OR u.published_at <= %(before)s::timestamptz)
+                ON CONFLICT (youtube_id)
+                DO UPDATE
+                  SET title = EXCLUDED.title,
+                      description = EXCLUDED.description,
+                      published_at = EXCLUDED.published_at,
+                      duration = EXCLUDED.duration,
+                      channel_id = EXCLUDED.channel_id
+                """,
+                {
+                    "channel_id": channel_id,
+                    "youtube_ids": [v["video_id"] for v in batch],
+                    "titles": [v["title"] for v in batch],
+                    "descriptions": [v["description"] for v in batch],
+                    "published_ats": [v["published_at"] for v in batch],
+                    "durations": [v["duration"] for v in batch],
+                    "after": published_after,
+                    "before": published_before,
+                },
+            )
+            upserted += cur.rowcount
+            log.debug("Upserted video batch %d (%d / %d videos in date range).", (i // batch_size) + 1, cur.rowcount, len(batch))
+
+    return upserted
+
+
+def fetch_channel_youtube_ids(conn, channel_id: str) -> set:
+    """Return the YouTube ids already stored in `videos` for a channel."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT youtube_id FROM public.videos WHERE channel_id = %s", (channel_id,))
+        return {row["youtube_id"] for row in cur}
 
 
 def next_videos_batch(limit: int = 100, cursor: Optional[dict] = None):
@@ -236,8 +377,7 @@ def next_videos_batch(limit: int = 100, cursor: Optional[dict] = None):
           - rows: List of videos returned from the query
           - next_cursor: Dictionary representing the last video's keyset (for the next call)
     """
-    conn = get_conn()
-    print(f"[DB] Requesting pending videos (limit={limit}, cursor={cursor}).")
+    log.debug("Requesting pending videos (limit=%d, cursor=%s).", limit, cursor)
     # Prepare parameters for the keyset pagination function
     params = {
         "p_limit": limit,
@@ -254,7 +394,7 @@ def next_videos_batch(limit: int = 100, cursor: Optional[dict] = None):
     """
 
     # Execute the stored function and collect its output rows
-    with conn.cursor() as cur:
+    with get_conn() as conn, conn.cursor() as cur:
         cur.execute(query, params)
         rows = cur.fetchall()
 
@@ -264,8 +404,7 @@ def next_videos_batch(limit: int = 100, cursor: Optional[dict] = None):
         last = rows[-1]
         next_cursor = {"duration": last["duration"], "id": last["id"]}
 
-    conn.close()
-    print(f"[DB] Retrieved {len(rows)} rows. Next cursor: {next_cursor}")
+    log.info("Retrieved %d rows. Next cursor: %s", len(rows), next_cursor)
     return rows, next_cursor
 
 
@@ -283,8 +422,8 @@ def delete_video_fingerprints(conn, video_id: str) -> int:
     Returns:
         Number of rows deleted from fingerprints.
     """
-    # Using `with conn:` makes the whole block a transaction (commit on success, rollback on error)
-    with conn:
+    # Run the whole block as one transaction (commit on success, rollback on error)
+    with conn.transaction():
         with conn.cursor() as cur:
             # Delete all occurrences for this video (triggers handle counters/mappings/cleanup)
             cur.execute(
@@ -292,23 +431,23 @@ def delete_video_fingerprints(conn, video_id: str) -> int:
                 (video_id,)
             )
             deleted = cur.rowcount  # how many occurrence rows were removed
-            print(f"[DB] Deleted {deleted} fingerprint rows for video {video_id}.")
+            log.info("Deleted %d fingerprint rows for video %s.", deleted, video_id)
 
             # Mark the video as not fingerprinted
             cur.execute(
                 "UPDATE public.videos SET match_status = NULL WHERE id = %s;",
                 (video_id,)
             )
-            print(f"[DB] Cleared match_status for video {video_id}.")
+            log.debug("Cleared match_status for video %s.", video_id)
 
     return deleted
 
 def mark_video_status(video_uuid, status, conn=None, original_video_id=None):
     """Update video status and optionally set original_video_id."""
-    created_conn = False
+    # Without a caller's connection, borrow one from the pool; leaving the block commits
     if conn is None:
-        conn = get_conn()
-        created_conn = True
+        with get_conn() as conn:
+            return mark_video_status(video_uuid, status, conn, original_video_id)
 
     with conn.cursor() as cur:
         if original_video_id:
@@ -330,17 +469,13 @@ def mark_video_status(video_uuid, status, conn=None, original_video_id=None):
                 """,
                 (status, video_uuid),
             )
-    print(f"[DB] Video {video_uuid} status updated to '{status}' (original={original_video_id}).")
-    # Commit and close connection if function created the connection
-    if created_conn:
-        conn.commit()
-        conn.close()
+    log.info("Video %s status updated to '%s' (original=%s).", video_uuid, status, original_video_id)
 
 
 
 
 if __name__ == "__main__":
-    conn = get_conn()
     video_id = "575078a3-2c0e-44be-ae52-427e4ddd6727"
-    deleted_rows = delete_video_fingerprints(conn, video_id)
+    with get_conn() as conn:
+        deleted_rows = delete_video_fingerprints(conn, video_id)
     print(f"Total Rows Deleted: {deleted_rows}")
@@ -1,6 +1,8 @@
+import numpy as np
 import torch
-import librosa
+import soxr
 import soundfile as sf
+from numpy.lib.stride_tricks import sliding_window_view
 
 def load_and_process(path: str, target_sr: int = 16000):
     """
@@ -14,36 +16,49 @@ def load_and_process(path: str, target_sr: int = 16000):
         waveform (torch.Tensor): Audio waveform as a 1D torch tensor.
         target_sr (int): The sample rate of the returned waveform.
     """
-    data, samplerate = sf.read(path, dtype="float32")
-    waveform = torch.from_numpy(data)
+    data, samplerate = sf.read(path, dtype="float32", always_2d=True)
 
-    # Stereo → mono
-    if waveform.ndim > 1:
-        waveform = waveform.mean(dim=1)
+    # Stereo → mono in NumPy (mono files are just a column view); torch only sees the final signal
+    if data.shape[1] > 1:
+        waveform_np = data.mean(axis=1, dtype=np.float32)
+    else:
+        waveform_np = data[:, 0]
 
-    # Resample
-    waveform_np = waveform.numpy()
-    waveform_resampled = librosa.resample(
-        waveform_np, orig_sr=samplerate, target_sr=target_sr
-    )
-    waveform = torch.from_numpy(waveform_resampled)
+    # Resample (soxr's C polyphase resampler; skipped when the rate already matches)
+    if samplerate != target_sr:
+        waveform_np = soxr.resample(waveform_np, samplerate, target_sr, quality="HQ")
+
+    waveform = torch.from_numpy(np.ascontiguousarray(waveform_np))
 
     return waveform, target_sr
 
 
 def chunk_mono_audio(wav, sr, chunk_duration=120, overlap=30):
-    """Split audio into overlapping chunks(seconds)"""
+    """
+    Split audio into overlapping chunks(seconds).
+    Yields (chunk, sr, start_sec, end_sec); every chunk is a strided view into `wav`, not a copy.
+    """
     chunk_samples = int(chunk_duration * sr)
-    overlap_samples = int(overlap * sr)
+    hop = chunk_samples - int(overlap * sr)
     total_samples = len(wav)
+    if total_samples == 0:
+        return
+
+    # All full-length chunks at once, as strided views
+    if total_samples >= chunk_samples:
+        if torch.is_tensor(wav):
+            windows = wav.unfold(0, chunk_samples, hop)
+        else:
+            windows = sliding_window_view(np.asarray(wav), chunk_samples)[::hop]
+    else:
+        windows = wav[:0]
+
+    for i in range(len(windows)):
+        start = i * hop
+        yield windows[i], sr, start/sr, (start + chunk_samples)/sr
 
-    chunks = []
-    start = 0
-    while start < total_samples:
-        end = min(start + chunk_samples, total_samples)
-        chunk = wav[start:end]
-        chunks.append((chunk, sr, start/sr, end/sr))
-        if end == total_samples:
-            break
-        start += chunk_samples - overlap_samples
-    return chunks
+    # Trailing partial chunk, unless the last full window already ended on the final sample
+    start = len(windows) * hop
+    if len(windows) and start - hop + chunk_samples == total_samples:
+        return
+    yield wav[start:], sr, start/sr, total_samples/sr
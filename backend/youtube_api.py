@@ -1,9 +1,12 @@
 import os
+import re
+import asyncio
+import httpx
 from dotenv import load_dotenv
 from googleapiclient.discovery import build
 from datetime import datetime, timezone
-import isodate
 from supabase import create_client
+from supabase_utils import get_conn, upsert_videos, fetch_channel_youtube_ids
 
 
 load_dotenv()
@@ -15,6 +18,19 @@ supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 API_KEY = os.getenv("GOOGLE_API_KEY")
 youtube = build("youtube", "v3", developerKey=API_KEY)
 
+# Bulk endpoints (playlistItems / videos) go over plain REST so batches can be in flight together
+YOUTUBE_API_URL = "https://www.googleapis.com/youtube/v3"
+# Metadata requests allowed in flight at once (keeps bursts well inside the API rate limits)
+YOUTUBE_API_CONCURRENCY = int(os.getenv("YOUTUBE_API_CONCURRENCY", 8))
+
+# YouTube's contentDetails.duration: P[nD]T[nH][nM][nS]
+_ISO_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+
+async def _api_get(client: httpx.AsyncClient, resource: str, **params):
+    res = await client.get(f"{YOUTUBE_API_URL}/{resource}", params={**params, "key": API_KEY})
+    res.raise_for_status()
+    return res.json()
+
 def get_channel_id_from_query(query):
     print(f"Searching for channel: {query}")
     res = youtube.search().list(
@@ -47,12 +63,21 @@ def get_channel_info(channel_id):
         "uploads_playlist": item["contentDetails"]["relatedPlaylists"]["uploads"]
     }
 
-def get_video_metadata(video_ids):
+def parse_duration_seconds(value):
+    """ISO 8601 video duration (e.g. PT1H2M3S, P1DT4M) -> whole seconds, or None if missing/zero/unparseable."""
+    match = _ISO_DURATION.fullmatch(value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(g) for g in match.groups(default="0"))
+    return (days * 86400 + hours * 3600 + minutes * 60 + seconds) or None
+
+async def get_video_metadata(client, video_ids):
     """Fetch metadata for up to 50 videos at once"""
-    res = youtube.videos().list(
+    res = await _api_get(
+        client, "videos",
         part="snippet,statistics,contentDetails",
         id=",".join(video_ids)
-    ).execute()
+    )
 
     details = []
     for item in res["items"]:
@@ -61,66 +86,86 @@ def get_video_metadata(video_ids):
 
         published_at = None
         if snippet.get("publishedAt"):
-            published_at = datetime.fromisoformat(
-                snippet["publishedAt"].replace("Z", "+00:00")
-            )
-
-        duration = None
-        if content.get("duration"):
-            try:
-                duration = isodate.parse_duration(content["duration"])
-            except Exception:
-                pass
+            # Always UTC with a trailing 'Z', e.g. 2024-05-01T17:00:03Z
+            published_at = datetime.fromisoformat(snippet["publishedAt"][:-1]).replace(tzinfo=timezone.utc)
 
         details.append({
             "video_id": item["id"],
             "title": snippet.get("title"),
             "description": snippet.get("description"),
-            "published_at": published_at.isoformat() if published_at else None,
-            "duration": str(duration) if duration else None,
+            "published_at": published_at,
+            "duration": parse_duration_seconds(content.get("duration")),
         })
     return details
 
-def get_all_video_ids(playlist_id, max_results=50):
+async def get_all_video_ids(client, playlist_id, max_results=50, after_date=None, before_date=None):
+    """
+    List the playlist's video ids. With a date range, items are dropped here using
+    contentDetails.videoPublishedAt, before any videos.list quota is spent on them.
+    """
+    # Each page needs the previous page's token, so the playlist walk itself stays sequential
     video_ids = []
     next_page = None
     while True:
-        res = youtube.playlistItems().list(
-            part="contentDetails",
-            playlistId=playlist_id,
-            maxResults=max_results,
-            pageToken=next_page
-        ).execute()
-        video_ids.extend([i["contentDetails"]["videoId"] for i in res["items"]])
+        params = {"part": "contentDetails", "playlistId": playlist_id, "maxResults": max_results}
+        if next_page:
+            params["pageToken"] = next_page
+        res = await _api_get(client, "playlistItems", **params)
+        for item in res["items"]:
+            details = item["contentDetails"]
+            if after_date or before_date:
+                # Private/deleted uploads carry no publish date; they could never pass the filter
+                if not details.get("videoPublishedAt"):
+                    continue
+                published = datetime.fromisoformat(details["videoPublishedAt"])
+                if (after_date and published < after_date) or (before_date and published > before_date):
+                    continue
+            video_ids.append(details["videoId"])
         next_page = res.get("nextPageToken")
         if not next_page:
             break
     return video_ids
 
-def upsert_videos_in_batches(videos, channel_id, batch_size=500):
-    for i in range(0, len(videos), batch_size):
-        batch = videos[i:i+batch_size]
-        for v in batch:
-            v["channel_id"] = channel_id
-        try:
-            supabase.table("videos").upsert(batch).execute()
-            print(f"Upserted batch {i//batch_size + 1} ({len(batch)} videos)")
-        except Exception as e:
-            print(f"Error inserting batch {i//batch_size + 1}: {e}")
-
-def filter_videos_by_date(videos, after_date=None, before_date=None):
-    filtered = []
-    for v in videos:
-        published = v.get("published_at")
-        if not published:
-            continue
-        published_dt = datetime.fromisoformat(published.replace("Z", "+00:00"))
-        if after_date and published_dt < after_date:
-            continue
-        if before_date and published_dt > before_date:
-            continue
-        filtered.append(v)
-    return filtered
+async def fetch_channel_videos(playlist_id, batch_size=50, after_date=None, before_date=None, skip_ids=()):
+    """
+    Collect the uploads playlist's video ids in the date range, drop duplicates and
+    any id in `skip_ids`, then fetch metadata for all remaining 50-id batches
+    concurrently (bounded by YOUTUBE_API_CONCURRENCY).
+    Returns the video ids and one metadata list per batch, in playlist order.
+    """
+    limiter = asyncio.Semaphore(YOUTUBE_API_CONCURRENCY)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        video_ids = await get_all_video_ids(
+            client, playlist_id, after_date=after_date, before_date=before_date
+        )
+        # Only unseen videos cost a videos.list quota unit and an upsert row
+        video_ids = [v for v in dict.fromkeys(video_ids) if v not in skip_ids]
+
+        async def fetch_batch(batch_ids):
+            async with limiter:
+                return await get_video_metadata(client, batch_ids)
+
+        batches = await asyncio.gather(*(
+            fetch_batch(video_ids[i:i+batch_size])
+            for i in range(0, len(video_ids), batch_size)
+        ))
+    return video_ids, batches
+
+def upsert_videos_in_batches(videos, channel_id, batch_size=10000, after_date=None, before_date=None):
+    """
+    Upsert straight into Postgres: one UNNEST statement per batch, one transaction for all of them.
+    The publish-date range is applied inside the INSERT ... SELECT.
+    """
+    try:
+        with get_conn() as conn:
+            return upsert_videos(
+                conn, videos, channel_id, batch_size,
+                published_after=after_date, published_before=before_date,
+            )
+    except Exception as e:
+        print(f"Error upserting videos: {e}")
+        return 0
 
 def youtube_ingest(channel_handle, after_date=None, before_date=None):
     """Full workflow: fetch all videos from channel and upsert to Supabase"""
@@ -131,23 +176,25 @@ def youtube_ingest(channel_handle, after_date=None, before_date=None):
 
     channel_info = get_channel_info(channel_id)
     playlist_id = channel_info["uploads_playlist"]
-    video_ids = get_all_video_ids(playlist_id)
-    print(f"Found {len(video_ids)} videos from {channel_info['title']}")
+    with get_conn() as conn:
+        known_ids = fetch_channel_youtube_ids(conn, channel_id)
+    print(f"{len(known_ids)} videos from {channel_info['title']} already ingested; skipping them")
+
+    video_ids, metadata_batches = asyncio.run(
+        fetch_channel_videos(playlist_id, after_date=after_date, before_date=before_date, skip_ids=known_ids)
+    )
+    print(f"Found {len(video_ids)} new videos in date range from {channel_info['title']}")
 
     # Insert channel record
     channel_row = {"id": channel_id, "title": channel_info["title"]}
     supabase.table("channels").upsert(channel_row).execute()
     print(f"Upserted channel: {channel_row['title']}")
 
-    total_inserted = 0
-    for i in range(0, len(video_ids), 50):
-        batch_ids = video_ids[i:i+50]
-        print(f"Fetching metadata for batch {i//50 + 1} ({len(batch_ids)} videos)")
-        batch_metadata = get_video_metadata(batch_ids)
-        filtered = filter_videos_by_date(batch_metadata, after_date, before_date)
-        print(f"→ {len(filtered)} / {len(batch_metadata)} passed date filter")
-        if filtered:
-            upsert_videos_in_batches(filtered, channel_id)
-            total_inserted += len(filtered)
+    videos = []
+    for i, batch_metadata in enumerate(metadata_batches):
+        print(f"Fetched metadata for batch {i + 1} ({len(batch_metadata)} videos)")
+        videos.extend(batch_metadata)
+
+    total_inserted = upsert_videos_in_batches(videos, channel_id, after_date=after_date, before_date=before_date)
 
     print(f"Inserted {total_inserted} videos into Supabase")
@@ -0,0 +1,70 @@
+-- Landmark hashes are now bit-packed 64-bit integers (f1 << 40 | f2 << 20 | dt)
+-- instead of 20-char SHA-1 hex prefixes. The old text hashes can't be mapped to
+-- the new scheme, so stored fingerprints are cleared and fingerprinted videos are
+-- put back in the queue to be re-fingerprinted.
+TRUNCATE public.fingerprints, public.fingerprint_hashes;
+
+UPDATE public.videos
+SET match_status = NULL
+WHERE match_status = 'fingerprinted';
+
+-- Store hashes as BIGINT (8 bytes vs ~21 for the text form; smaller b-tree indexes)
+ALTER TABLE public.fingerprints ALTER COLUMN hash TYPE BIGINT USING hash::bigint;
+ALTER TABLE public.fingerprint_hashes ALTER COLUMN hash TYPE BIGINT USING hash::bigint;
+
+-- Return types change, so the functions must be dropped and recreated
+DROP FUNCTION IF EXISTS public.find_fingerprint_candidates(jsonb, double precision, integer, integer, integer);
+DROP FUNCTION IF EXISTS public.get_stopwords(double precision);
+
+CREATE FUNCTION public.get_stopwords(fraction double precision)
+ RETURNS TABLE(hash bigint)
+ LANGUAGE sql
+AS $function$SELECT hash
+FROM public.fingerprint_hashes
+ORDER BY total_count DESC
+LIMIT GREATEST(1, FLOOR(fraction * (SELECT COUNT(*) FROM public.fingerprint_hashes)));$function$
+;
+
+CREATE FUNCTION public.find_fingerprint_candidates(occurrences jsonb, ignore_fraction double precision DEFAULT 0.01, min_matches integer DEFAULT 6, max_hits_per_hash integer DEFAULT 1000, limit_candidates integer DEFAULT 50)
+ RETURNS TABLE(video_id uuid, delta integer, hashes bigint[], matches bigint)
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+  RETURN QUERY
+  WITH input AS (
+    SELECT (x->>'hash')::bigint AS hash,
+           (x->>'t_ref')::int  AS t_ref
+    FROM jsonb_array_elements(occurrences) AS x
+  ),
+  stop AS (
+    SELECT hash FROM public.get_stopwords(ignore_fraction)
+  ),
+  q AS (
+    SELECT i.hash, i.t_ref
+    FROM input i
+    LEFT JOIN stop s USING (hash)
+    WHERE s.hash IS NULL
+  ),
+  j AS (
+    SELECT f.video_id,
+           (f.t_ref - q.t_ref) AS delta,
+           q.hash,
+           ROW_NUMBER() OVER (PARTITION BY q.hash ORDER BY f.video_id, f.t_ref) AS rn
+    FROM q
+    JOIN public.fingerprints f
+      ON f.hash = q.hash
+  )
+  SELECT
+    j.video_id,
+    j.delta,
+    ARRAY_AGG(DISTINCT j.hash) AS hashes,
+    COUNT(*) AS matches
+  FROM j
+  WHERE j.rn <= max_hits_per_hash
+  GROUP BY j.video_id, j.delta
+  HAVING COUNT(*) >= min_matches
+  ORDER BY matches DESC
+  LIMIT limit_candidates;
+END;
+$function$
+;
@@ -0,0 +1,48 @@
+-- find_fingerprint_candidates takes the clip's occurrences as two aligned arrays
+-- instead of a JSONB array of {hash, t_ref} objects: no json.dumps on the client,
+-- no jsonb parse on the server, and a much smaller bind payload.
+DROP FUNCTION IF EXISTS public.find_fingerprint_candidates(jsonb, double precision, integer, integer, integer);
+
+-- Argument names are prefixed so they don't collide with the `hashes` output column
+CREATE FUNCTION public.find_fingerprint_candidates(p_hashes bigint[], p_t_refs integer[], ignore_fraction double precision DEFAULT 0.01, min_matches integer DEFAULT 6, max_hits_per_hash integer DEFAULT 1000, limit_candidates integer DEFAULT 50)
+ RETURNS TABLE(video_id uuid, delta integer, hashes bigint[], matches bigint)
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+  RETURN QUERY
+  WITH input AS (
+    SELECT u.hash, u.t_ref
+    FROM UNNEST(p_hashes, p_t_refs) AS u(hash, t_ref)
+  ),
+  stop AS (
+    SELECT hash FROM public.get_stopwords(ignore_fraction)
+  ),
+  q AS (
+    SELECT i.hash, i.t_ref
+    FROM input i
+    LEFT JOIN stop s USING (hash)
+    WHERE s.hash IS NULL
+  ),
+  j AS (
+    SELECT f.video_id,
+           (f.t_ref - q.t_ref) AS delta,
+           q.hash,
+           ROW_NUMBER() OVER (PARTITION BY q.hash ORDER BY f.video_id, f.t_ref) AS rn
+    FROM q
+    JOIN public.fingerprints f
+      ON f.hash = q.hash
+  )
+  SELECT
+    j.video_id,
+    j.delta,
+    ARRAY_AGG(DISTINCT j.hash) AS hashes,
+    COUNT(*) AS matches
+  FROM j
+  WHERE j.rn <= max_hits_per_hash
+  GROUP BY j.video_id, j.delta
+  HAVING COUNT(*) >= min_matches
+  ORDER BY matches DESC
+  LIMIT limit_candidates;
+END;
+$function$
+;
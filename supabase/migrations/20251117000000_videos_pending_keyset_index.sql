@@ -0,0 +1,29 @@
+-- Back get_videos_pending_keyset with an index that matches it exactly: same
+-- predicate (match_status IS NULL) and same sort key (duration, id), read
+-- backwards for the DESC order. Each "next page" becomes an index range scan
+-- with no sort node, and the index only holds the unclaimed queue.
+--
+-- Migrations run inside a transaction, where CREATE INDEX CONCURRENTLY is not
+-- allowed. On a large live table, run the CONCURRENTLY form by hand first; this
+-- statement is then a no-op.
+CREATE INDEX IF NOT EXISTS videos_pending_keyset_idx
+  ON public.videos (duration, id)
+  WHERE match_status IS NULL;
+
+-- The keyset predicate compared v.id against itself, which reduced it to
+-- duration < p_last_duration: rows tied on duration with the last row of a page
+-- were skipped, and the row comparison could not be used as an index bound.
+CREATE OR REPLACE FUNCTION public.get_videos_pending_keyset(p_limit integer, p_last_duration interval DEFAULT NULL::interval, p_last_id uuid DEFAULT NULL::uuid)
+ RETURNS SETOF public.videos
+ LANGUAGE sql
+ STABLE
+AS $function$SELECT v.*
+FROM videos v
+WHERE v.match_status IS NULL
+  AND (
+    p_last_duration IS NULL
+    OR (v.duration, v.id) < (p_last_duration, p_last_id)
+  )
+ORDER BY v.duration DESC, v.id DESC
+LIMIT p_limit;$function$
+;